@@ -3,10 +3,18 @@ Boltz-2 Structure Prediction App
 Gradio interface for protein structure prediction — deploy on Lightning AI.
 """
 
+import hashlib
+import importlib.metadata
+import json
 import os
 import shutil
 import tempfile
+import textwrap
+import time
+from collections import deque
 from datetime import datetime
+from itertools import chain
+from pathlib import Path
 
 import gradio as gr
 import numpy as np
@@ -16,14 +24,21 @@ from prediction import (
     parse_fasta,
     validate_protein,
     validate_smiles,
+    validate_job,
     create_boltz_yaml,
     run_prediction,
+    cancel_prediction,
+    new_job_dir,
+    start_job_sweeper,
+    JOB_ROOTS,
     oligomer_name,
 )
 from visualization import (
     viewer_html,
+    set_viewer_script,
     plot_pae,
     plot_plddt,
+    sweep_plot_cache,
     find_confidence_files,
     load_plddt,
     load_pae,
@@ -39,6 +54,119 @@ LQVGQVELGGGPGAGSLQPLALEGSLQKRGIVEQCCTSICSLYQLENYCN"""
 
 EXAMPLE_LIGAND = "CC(=O)Oc1ccccc1C(=O)O"  # Aspirin
 
+# Minimum gap between intermediate UI updates. Every yield re-renders all
+# seven output components over SSE, so bursts of updates are coalesced.
+UI_UPDATE_INTERVAL = 0.05  # seconds
+BOLTZ_LOG_TAIL = 50  # Boltz output lines shown in the log panel
+
+# Local copy of 3Dmol.js (fetched by run.sh). Served through Gradio's file
+# route so viewer iframes share one HTTP-cached script; CDN when absent.
+VIEWER_ASSETS = Path(__file__).resolve().parent / "assets"
+VIEWER_JS = VIEWER_ASSETS / "3Dmol-min.js"
+_FILE_ROUTE = (
+    "gradio_api/file=" if int(gr.__version__.split(".")[0]) >= 5 else "file="
+)
+if VIEWER_JS.is_file():
+    set_viewer_script(f"{_FILE_ROUTE}{VIEWER_JS}")
+
+# Finished predictions, keyed by a hash of every input that affects them
+# (and the Boltz version). Least recently used entries are pruned by the
+# sweeper once the cache exceeds RESULT_CACHE_MAX_BYTES.
+RESULT_CACHE_DIR = Path(
+    os.environ.get("BOLTZ_APP_CACHE", Path.home() / ".cache" / "boltz2-app")
+)
+RESULT_CACHE_MAX_BYTES = int(
+    float(os.environ.get("BOLTZ_APP_CACHE_GB", "5")) * 1024**3
+)
+try:
+    BOLTZ_VERSION = importlib.metadata.version("boltz")
+except importlib.metadata.PackageNotFoundError:
+    BOLTZ_VERSION = "unknown"
+
+
+# ---------------------------------------------------------------------------
+# Result cache
+# ---------------------------------------------------------------------------
+
+
+def _link_or_copy(src: str, dst: str) -> str:
+    """Expose *src* as *dst* without copying bytes when possible."""
+    try:
+        os.link(src, dst)  # same filesystem: no data is read or written
+    except OSError:
+        shutil.copyfile(src, dst)  # sendfile() under the hood on Linux
+    return dst
+
+
+def _cache_key(*inputs) -> str:
+    text = "|".join(str(i) for i in (BOLTZ_VERSION, *inputs))
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+
+def _load_cached(key: str, job_dir: str) -> tuple[dict, dict] | None:
+    """Return ``(summary, files)`` for *key* with files placed in *job_dir*."""
+    entry = RESULT_CACHE_DIR / key
+    try:
+        summary = json.loads((entry / "summary.json").read_text())
+        files = {
+            f.name: _link_or_copy(str(f), os.path.join(job_dir, f.name))
+            for f in entry.iterdir()
+            if f.name != "summary.json"
+        }
+    except (OSError, ValueError):
+        return None
+    os.utime(entry)  # mark as recently used for pruning
+    return summary, files
+
+
+def _store_cached(key: str, summary: dict, files: list[str | None]) -> None:
+    """Save a finished result; the entry appears atomically or not at all.
+
+    Only complete results (every file present) are stored, so a run whose
+    plots failed is redone next time instead of being served forever.
+    """
+    if not all(files) or (RESULT_CACHE_DIR / key).exists():
+        return
+    tmp = None
+    try:
+        RESULT_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = tempfile.mkdtemp(prefix=".tmp_", dir=RESULT_CACHE_DIR)
+        for path in filter(None, files):
+            shutil.copyfile(path, os.path.join(tmp, os.path.basename(path)))
+        Path(tmp, "summary.json").write_text(json.dumps(summary))
+        os.rename(tmp, RESULT_CACHE_DIR / key)
+    except OSError as exc:
+        print(f"Warning: could not cache result {key}: {exc}")
+        if tmp:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+
+def prune_result_cache(max_bytes: int = RESULT_CACHE_MAX_BYTES) -> None:
+    """Evict least recently used entries until the cache fits *max_bytes*."""
+    stale = time.time() - 3600  # abandoned .tmp_ dirs from crashed stores
+    entries = []
+    try:
+        with os.scandir(RESULT_CACHE_DIR) as it:
+            for entry in it:
+                if not entry.is_dir(follow_symlinks=False):
+                    continue
+                mtime = entry.stat().st_mtime
+                if entry.name.startswith(".tmp_"):
+                    if mtime < stale:
+                        shutil.rmtree(entry.path, ignore_errors=True)
+                    continue
+                with os.scandir(entry.path) as files:
+                    size = sum(f.stat().st_size for f in files)
+                entries.append((mtime, size, entry.path))
+    except FileNotFoundError:
+        return
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+
 
 # ---------------------------------------------------------------------------
 # Main prediction generator (yields partial UI updates)
@@ -50,21 +178,49 @@ def _error(msg: str, logs: str = ""):
     return (None, f"❌ **Error:** {msg}", "", None, None, None, logs or msg)
 
 
+def _start_job(prev_job_dir: str | None) -> str:
+    """Cancel the prediction a new submission supersedes; return a job dir."""
+    if prev_job_dir:
+        cancel_prediction(prev_job_dir)
+    return new_job_dir()
+
+
 def predict_structure(
-    protein_text, ligand_smiles, _use_msa, sampling_steps, num_copies, cyclic
+    protein_text,
+    ligand_smiles,
+    _use_msa,
+    sampling_steps,
+    num_copies,
+    cyclic,
+    job_dir=None,
 ):
     """
     Generator that yields ``(viewer, status, metrics, file, pae_img,
     plddt_img, logs)`` tuples as prediction progresses.
     """
     logs: list[str] = []
+    boltz_tail: deque[str] = deque(maxlen=BOLTZ_LOG_TAIL)
+    last_emit = 0.0
+    last_state: tuple[str, str] | None = None
 
     def log(msg):
         logs.append(f"[{datetime.now():%H:%M:%S}] {msg}")
         print(msg)
 
-    def state(status="⏳ Running..."):
-        return (None, status, "", None, None, None, "\n".join(logs))
+    def emit(status="⏳ Running...", *, force=False):
+        """Yield an intermediate state unless it is unchanged or too soon.
+
+        Pass ``force=True`` before blocking work so the update is not lost.
+        """
+        nonlocal last_emit, last_state
+        now = time.monotonic()
+        if not force and now - last_emit < UI_UPDATE_INTERVAL:
+            return
+        text = "\n".join(chain(logs, boltz_tail))
+        if (status, text) == last_state:
+            return
+        last_emit, last_state = now, (status, text)
+        yield (None, status, "", None, None, None, text)
 
     # -- validate protein --------------------------------------------------
     if not protein_text or not protein_text.strip():
@@ -72,7 +228,7 @@ def predict_structure(
         return
 
     log("Parsing protein sequence…")
-    yield state("⏳ Validating input…")
+    yield from emit("⏳ Validating input…")
 
     header, sequence = parse_fasta(protein_text)
     ok, result = validate_protein(sequence)
@@ -96,10 +252,35 @@ def predict_structure(
 
     # -- set up job --------------------------------------------------------
     num_copies = int(num_copies or 1)
-    job_dir = tempfile.mkdtemp(prefix="boltz_")
+    ok, result = validate_job(sequence, num_copies)
+    if not ok:
+        yield _error(result)
+        return
+    job_dir = job_dir or new_job_dir()
     log(f"Job dir: {job_dir}")
 
     try:
+        # -- reuse an identical earlier prediction ---------------------------
+        sampling_steps = int(sampling_steps)
+        cache_key = _cache_key(
+            sequence, ligand_smiles, sampling_steps, num_copies, bool(cyclic)
+        )
+        cached = _load_cached(cache_key, job_dir)
+        if cached:
+            summary, files = cached
+            out_file = files[f"structure.{summary['fmt']}"]
+            log(f"♻️ Reusing cached result {cache_key}")
+            yield (
+                viewer_html(out_file, summary["fmt"]),
+                summary["status"],
+                summary["metrics"],
+                out_file,
+                files.get("pae.png"),
+                files.get("plddt.png"),
+                "\n".join(logs),
+            )
+            return
+
         yaml_path = create_boltz_yaml(
             sequence,
             job_dir,
@@ -109,8 +290,7 @@ def predict_structure(
             num_copies=num_copies,
         )
         with open(yaml_path) as fh:
-            for line in fh:
-                log(f"  {line.rstrip()}")
+            log("Input YAML:\n" + textwrap.indent(fh.read().rstrip(), "  "))
 
         oname = oligomer_name(num_copies)
         oligo = f" × {num_copies} ({oname})" if num_copies > 1 else ""
@@ -119,28 +299,38 @@ def predict_structure(
             f"Starting Boltz-2: {len(sequence)} aa{oligo}{cyc}, "
             f"{sampling_steps} steps, MSA enabled"
         )
-        yield state(
+        running = (
             f"⏳ **Running Boltz-2…**\n\nSequence: {len(sequence)} aa"
             f"{oligo}{cyc}\n\nThis may take several minutes."
         )
+        yield from emit(running, force=True)
 
-        # -- run Boltz-2 ---------------------------------------------------
-        success, result, metrics, raw_log = run_prediction(
+        # -- run Boltz-2 (output streamed into the log panel) --------------
+        run = run_prediction(
             yaml_path,
             job_dir,
             sampling_steps=sampling_steps,
-            seq_len=len(sequence),
+            seq_len=len(sequence) * num_copies,
         )
-
-        # Append trimmed Boltz output to our logs
-        if raw_log:
-            logs.append("\n--- Boltz-2 Output ---")
-            for line in raw_log.split("\n")[-50:]:
-                if line.strip() and not any(
-                    x in line for x in ["%|", "it/s]", "━"]
-                ):
-                    logs.append(line)
-
+        logs.append("\n--- Boltz-2 Output ---")
+        while True:
+            try:
+                line = next(run)
+            except StopIteration as done:
+                success, result, metrics, raw_log = done.value
+                break
+            if line is None:  # Boltz is quiet: flush anything throttled
+                yield from emit(running)
+            elif line.strip() and not any(
+                x in line for x in ["%|", "it/s]", "━"]
+            ):
+                boltz_tail.append(line)
+                yield from emit(running)
+        logs.extend(boltz_tail)
+        boltz_tail.clear()
+
+        if not success and not os.path.isdir(job_dir):
+            return  # superseded by a newer submission; leave its UI alone
         if not success:
             logs.append(f"FAILED: {result}")
             yield (
@@ -155,31 +345,18 @@ def predict_structure(
             return
 
         log("✅ Prediction complete — processing results…")
-        yield state("⏳ Processing results…")
+        yield from emit("⏳ Processing results…", force=True)
 
-        # -- read structure ------------------------------------------------
-        structure_text = open(result).read()
         fmt = "cif" if result.endswith(".cif") else "pdb"
 
         # -- confidence plots ----------------------------------------------
-        conf = find_confidence_files(os.path.dirname(result))
-        if not conf["pae"] and not conf["plddt"]:
-            conf = find_confidence_files(job_dir)
-
-        # Debug: log what we found and list the actual output directory
+        struct_dir = os.path.dirname(result)
+        conf = find_confidence_files([struct_dir, job_dir])
         log(
             f"Confidence files: pae={conf['pae']}, plddt={conf['plddt']}, json={conf['confidence_json']}"
         )
-        struct_dir = os.path.dirname(result)
-        try:
-            import glob as _g
-
-            all_files = _g.glob(os.path.join(struct_dir, "*"))
-            log(
-                f"Files in {struct_dir}: {[os.path.basename(f) for f in all_files]}"
-            )
-        except Exception:
-            pass
+        if os.environ.get("BOLTZ_DEBUG"):
+            log(f"Files in {struct_dir}: {sorted(os.listdir(struct_dir))}")
 
         pae_img = plddt_img = None
         plddt_scores = None
@@ -209,8 +386,8 @@ def predict_structure(
 
         # -- 3D viewer -----------------------------------------------------
         log("Building 3D viewer…")
-        yield state("⏳ Creating 3D visualisation…")
-        html = viewer_html(structure_text, fmt)
+        yield from emit("⏳ Creating 3D visualisation…")
+        html = viewer_html(result, fmt)
 
         # -- metrics markdown ----------------------------------------------
         md = "### 📊 Prediction Metrics\n\n"
@@ -224,14 +401,14 @@ def predict_structure(
         for key, label in fmt_map.items():
             if key in metrics:
                 v = metrics[key]
-                if isinstance(v, list):
-                    v = sum(v) / len(v)
+                if isinstance(v, np.ndarray):
+                    v = v.mean()
                 if key == "binding_probability":
                     md += f"**{label}:** {v:.2%}\n\n"
                 else:
                     md += f"**{label}:** {v:.2f}\n\n"
         if plddt_scores is not None and "plddt" not in metrics:
-            md += f"**Mean pLDDT:** {np.mean(plddt_scores):.1f}\n\n"
+            md += f"**Mean pLDDT:** {plddt_scores.mean():.1f}\n\n"
         if not metrics and plddt_scores is None:
             md += "*Detailed metrics not available*\n"
 
@@ -244,10 +421,16 @@ def predict_structure(
             status += "💊 **Ligand:** included\n\n"
         status += f"📁 **Format:** {fmt.upper()}\n"
 
-        # -- copy structure for download -----------------------------------
-        out_file = os.path.join(job_dir, f"structure.{fmt}")
-        shutil.copy(result, out_file)
+        # -- expose structure for download ---------------------------------
+        out_file = _link_or_copy(
+            result, os.path.join(job_dir, f"structure.{fmt}")
+        )
         log("✅ Done!")
+        _store_cached(
+            cache_key,
+            {"fmt": fmt, "status": status, "metrics": md},
+            [out_file, pae_img, plddt_img],
+        )
 
         yield (html, status, md, out_file, pae_img, plddt_img, "\n".join(logs))
 
@@ -411,7 +594,16 @@ def create_app() -> gr.Blocks:
             logs_out,
         ]
 
-        predict_btn.click(
+        # A new submission kills the Boltz run it supersedes (and its job
+        # dir) before starting, instead of queueing behind it.
+        job_state = gr.State(None)
+        predict_event = predict_btn.click(
+            fn=_start_job,
+            inputs=job_state,
+            outputs=job_state,
+            queue=False,
+            trigger_mode="multiple",
+        ).then(
             fn=predict_structure,
             inputs=[
                 protein_input,
@@ -420,10 +612,12 @@ def create_app() -> gr.Blocks:
                 sampling_steps,
                 num_copies,
                 cyclic_input,
+                job_state,
             ],
             outputs=outputs,
             show_progress="hidden",
         )
+        predict_btn.click(fn=None, cancels=[predict_event])
 
         def clear_all():
             return (
@@ -463,9 +657,11 @@ def create_app() -> gr.Blocks:
 # ---------------------------------------------------------------------------
 
 if __name__ == "__main__":
+    start_job_sweeper(extra=(prune_result_cache, sweep_plot_cache))
     create_app().launch(
         server_name="0.0.0.0",
         server_port=7860,
         share=False,
         show_error=True,
+        allowed_paths=[*JOB_ROOTS, str(VIEWER_ASSETS)],
     )
@@ -0,0 +1,12 @@
+"""
+JSON parsing shared by the prediction and visualization modules.
+
+Uses orjson when installed (it parses Boltz's large numeric arrays
+faster), otherwise the standard library. Importing this has no side
+effects.
+"""
+
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
@@ -3,20 +3,46 @@ Boltz-2 prediction pipeline: input validation, YAML generation,
 subprocess execution, and result parsing.
 """
 
-import glob
-import json
+import atexit
 import os
+import queue
 import re
+import shutil
+import signal
+import string
 import subprocess
+import tempfile
+import threading
+import time
+from collections import deque
+from collections.abc import Callable, Generator
+from pathlib import Path
+
+import numpy as np
+
+from jsonload import json_loads
 
 # ---------------------------------------------------------------------------
 # Constants
 # ---------------------------------------------------------------------------
 
 VALID_AMINO_ACIDS = set("ACDEFGHIKLMNPQRSTVWY")
+VALID_SMILES_CHARS = set("CNOPSFIBrcnosp[]()=#@+-.0123456789\\/Hhelakbr")
 MIN_SEQ_LENGTH = 10
 MAX_SEQ_LENGTH = 2500
 PREDICTION_TIMEOUT = 1800  # 30 minutes
+LOG_TAIL_LINES = 2000  # Boltz output kept in memory for error reporting
+
+# Inherited by every `boltz` subprocess; set once here rather than per run.
+os.environ.setdefault("TORCH_FLOAT32_MATMUL_PRECISION", "medium")
+
+JOB_MAX_AGE = 6 * 3600  # seconds before an old job dir is swept
+JOB_SWEEP_INTERVAL = 3600  # seconds
+_SHM_MIN_FREE = 2 * 1024**3  # tmpfs room needed to put a new job there
+
+# Running Boltz processes keyed by job directory, so a newer submission
+# can stop the one it supersedes.
+_ACTIVE_JOBS: dict[str, subprocess.Popen] = {}
 
 OLIGOMER_NAMES = {
     1: "monomer",
@@ -33,32 +59,41 @@ OLIGOMER_NAMES = {
 # Input parsing / validation
 # ---------------------------------------------------------------------------
 
+# Byte tables for bytes.translate(): character-class scans run as a single
+# C loop instead of one interpreter step per character.
+_AMINO_ACID_BYTES = "".join(sorted(VALID_AMINO_ACIDS)).encode()
+_SMILES_BYTES = "".join(sorted(VALID_SMILES_CHARS)).encode()
+_FASTA_HEADER_RE = re.compile(r"^[ \t]*>(.*)$", re.MULTILINE)
+_ASCII_NON_ALPHA = bytes(
+    b for b in range(128) if b not in string.ascii_letters.encode()
+)
 
-def parse_fasta(fasta_text: str) -> tuple[str, str]:
-    """Return (header, sequence) from FASTA or raw sequence text."""
-    lines = fasta_text.strip().split("\n")
-    header = ""
-    parts: list[str] = []
 
-    for line in lines:
-        line = line.strip()
-        if line.startswith(">"):
-            header = line[1:].strip()
-        elif line:
-            parts.append("".join(c for c in line if c.isalpha()).upper())
+def _letters_only(text: str) -> str:
+    """Drop every non-letter from *text* and upper-case the rest."""
+    if text.isascii():
+        return text.encode().translate(None, _ASCII_NON_ALPHA).decode().upper()
+    return "".join(c for c in text if c.isalpha()).upper()
+
+
+def _invalid_chars(text: str, allowed: bytes) -> set[str]:
+    """Return the characters of *text* missing from the ASCII set *allowed*."""
+    # Deleting ASCII bytes never splits a multi-byte UTF-8 sequence.
+    return set(text.encode().translate(None, allowed).decode())
+
 
-    sequence = "".join(parts)
+def parse_fasta(fasta_text: str) -> tuple[str, str]:
+    """Return (header, sequence) from FASTA or raw sequence text."""
+    headers = _FASTA_HEADER_RE.findall(fasta_text)
+    if not headers:
+        # Raw sequence (no > header)
+        return "protein", _letters_only(fasta_text)
 
-    # Raw sequence (no > header)
-    if not header and not any(l.startswith(">") for l in lines):
-        sequence = "".join(c for c in fasta_text if c.isalpha()).upper()
-        header = "protein"
+    header = headers[-1].strip()
+    sequence = _letters_only(_FASTA_HEADER_RE.sub("", fasta_text))
 
     # Sanitise header for filenames
-    if header:
-        header = "".join(c if c.isalnum() or c == "_" else "_" for c in header)[
-            :30
-        ]
+    header = "".join(c if c.isalnum() or c == "_" else "_" for c in header[:30])
 
     return header, sequence
 
@@ -66,7 +101,7 @@ def parse_fasta(fasta_text: str) -> tuple[str, str]:
 def validate_protein(sequence: str) -> tuple[bool, str]:
     """Return (ok, cleaned_sequence_or_error)."""
     seq = sequence.upper().replace(" ", "").replace("\n", "")
-    bad = set(seq) - VALID_AMINO_ACIDS
+    bad = _invalid_chars(seq, _AMINO_ACID_BYTES)
     if bad:
         return False, f"Invalid amino acids: {', '.join(sorted(bad))}"
     if len(seq) < MIN_SEQ_LENGTH:
@@ -79,13 +114,24 @@ def validate_protein(sequence: str) -> tuple[bool, str]:
     return True, seq
 
 
+def validate_job(sequence: str, num_copies: int) -> tuple[bool, str]:
+    """Check the total residue count across all copies against the GPU cap."""
+    total = len(sequence) * num_copies
+    if total > MAX_SEQ_LENGTH:
+        return (
+            False,
+            f"Complex too large: {len(sequence)} aa × {num_copies} copies = "
+            f"{total} residues. Max {MAX_SEQ_LENGTH} due to GPU memory.",
+        )
+    return True, ""
+
+
 def validate_smiles(smiles: str) -> tuple[bool, str]:
     """Basic SMILES plausibility check. Empty string is valid (optional)."""
     if not smiles or not smiles.strip():
         return True, ""
     smiles = smiles.strip()
-    allowed = set("CNOPSFIBrcnosp[]()=#@+-.0123456789\\/Hhelakbr")
-    bad = set(smiles) - allowed
+    bad = _invalid_chars(smiles, _SMILES_BYTES)
     if bad:
         return False, f"Invalid SMILES characters: {', '.join(sorted(bad))}"
     return True, smiles
@@ -99,6 +145,24 @@ def oligomer_name(n: int) -> str:
 # YAML generation
 # ---------------------------------------------------------------------------
 
+# The whole input schema: one protein entity (optionally cyclic) plus an
+# optional ligand entity.
+_YAML_TEMPLATE = """\
+version: 1
+sequences:
+  - protein:
+      id: {chain_id}
+      sequence: {sequence}
+{cyclic}{ligand}"""
+
+_YAML_CYCLIC = "      cyclic: true\n"
+
+_YAML_LIGAND = """\
+  - ligand:
+      id: "{lig_id}"
+      smiles: "{smiles}"
+"""
+
 
 def create_boltz_yaml(
     sequence: str,
@@ -110,33 +174,119 @@ def create_boltz_yaml(
     num_copies: int = 1,
 ) -> str:
     """Write a Boltz-2 input YAML and return its path."""
-    chain_ids = [chr(ord("A") + i) for i in range(num_copies)]
+    chain_ids = [f'"{chr(ord("A") + i)}"' for i in range(num_copies)]
+    yaml_text = _YAML_TEMPLATE.format(
+        chain_id=f"[{', '.join(chain_ids)}]" if num_copies > 1 else chain_ids[0],
+        sequence=sequence,
+        cyclic=_YAML_CYCLIC if cyclic else "",
+        ligand=(
+            _YAML_LIGAND.format(
+                lig_id=chr(ord("A") + num_copies), smiles=ligand_smiles
+            )
+            if ligand_smiles
+            else ""
+        ),
+    )
+    yaml_path = Path(output_dir) / "input.yaml"
+    yaml_path.write_text(yaml_text)
+    return str(yaml_path)
 
-    lines = ["version: 1", "sequences:", "  - protein:"]
 
-    if num_copies > 1:
-        id_list = ", ".join(f'"{c}"' for c in chain_ids)
-        lines.append(f"      id: [{id_list}]")
-    else:
-        lines.append(f'      id: "{chain_ids[0]}"')
+# ---------------------------------------------------------------------------
+# Job directories
+# ---------------------------------------------------------------------------
+
+
+def _private_dir(parent: str) -> str | None:
+    """Create (mode 0700) and return *parent*/boltz2-app, or None."""
+    root = os.path.join(parent, "boltz2-app")
+    try:
+        os.makedirs(root, mode=0o700, exist_ok=True)
+    except OSError:
+        return None
+    return root
+
+
+# Job dirs live in dedicated subdirectories so those can be the only paths
+# Gradio is allowed to serve, never all of /dev/shm or /tmp. RAM-backed
+# /dev/shm is preferred for the many small MSA/feature files; the disk
+# root takes jobs whenever tmpfs is short on room.
+SHM_JOB_ROOT = _private_dir("/dev/shm") if os.path.isdir("/dev/shm") else None
+DISK_JOB_ROOT = _private_dir(tempfile.gettempdir())
+JOB_ROOTS = [r for r in (SHM_JOB_ROOT, DISK_JOB_ROOT) if r]
+
+# Job dirs created by this process, removed by one exit handler.
+_JOB_DIRS: set[str] = set()
+
+
+def _remove_job_dirs() -> None:
+    for job_dir in list(_JOB_DIRS):
+        shutil.rmtree(job_dir, ignore_errors=True)
 
-    lines.append(f"      sequence: {sequence}")
-    if cyclic:
-        lines.append("      cyclic: true")
 
-    if ligand_smiles:
-        lig_id = chr(ord("A") + num_copies)
-        lines += [
-            "  - ligand:",
-            f'      id: "{lig_id}"',
-            f'      smiles: "{ligand_smiles}"',
-        ]
+atexit.register(_remove_job_dirs)
 
-    yaml_text = "\n".join(lines) + "\n"
-    yaml_path = os.path.join(output_dir, "input.yaml")
-    with open(yaml_path, "w") as fh:
-        fh.write(yaml_text)
-    return yaml_path
+
+def _forget_job_dir(job_dir: str) -> None:
+    shutil.rmtree(job_dir, ignore_errors=True)
+    _JOB_DIRS.discard(job_dir)
+
+
+def new_job_dir() -> str:
+    """Create a job directory that is removed when the process exits.
+
+    tmpfs free space is checked per job, so a busy server falls back to
+    disk instead of letting Boltz hit ENOSPC mid-run.
+    """
+    root = DISK_JOB_ROOT
+    if SHM_JOB_ROOT:
+        try:
+            if shutil.disk_usage(SHM_JOB_ROOT).free >= _SHM_MIN_FREE:
+                root = SHM_JOB_ROOT
+        except OSError:
+            pass
+    job_dir = tempfile.mkdtemp(prefix="boltz_", dir=root)
+    _JOB_DIRS.add(job_dir)
+    return job_dir
+
+
+def sweep_job_dirs(max_age: float = JOB_MAX_AGE) -> None:
+    """Delete idle ``boltz_*`` job directories older than *max_age* seconds."""
+    cutoff = time.time() - max_age
+    for root in JOB_ROOTS:
+        try:
+            with os.scandir(root) as it:
+                for entry in it:
+                    if (
+                        entry.name.startswith("boltz_")
+                        and entry.path not in _ACTIVE_JOBS
+                        and entry.is_dir(follow_symlinks=False)
+                        and entry.stat().st_mtime < cutoff
+                    ):
+                        _forget_job_dir(entry.path)
+        except OSError as exc:
+            print(f"Warning: job sweep of {root} failed: {exc}")
+
+
+def start_job_sweeper(
+    interval: float = JOB_SWEEP_INTERVAL,
+    extra: tuple[Callable[[], None], ...] = (),
+) -> None:
+    """Sweep old job directories now and then every *interval* seconds.
+
+    Each callable in *extra* (e.g. a cache pruner) runs on the same timer.
+    """
+    sweep_job_dirs()
+    for sweep in extra:
+        try:
+            sweep()
+        except Exception as exc:
+            print(f"Warning: periodic sweep failed: {exc}")
+    timer = threading.Timer(
+        interval, start_job_sweeper, args=(interval, extra)
+    )
+    timer.daemon = True
+    timer.start()
 
 
 # ---------------------------------------------------------------------------
@@ -147,7 +297,10 @@ def create_boltz_yaml(
 def _build_command(
     yaml_path: str, output_dir: str, sampling_steps: int, seq_len: int
 ) -> list[str]:
-    """Assemble the `boltz predict` CLI invocation."""
+    """Assemble the `boltz predict` CLI invocation.
+
+    *seq_len* is the total residue count across all chain copies.
+    """
     cmd = [
         "boltz",
         "predict",
@@ -170,20 +323,35 @@ def _build_command(
 
 def _find_predictions_dir(output_dir: str) -> str | None:
     """Locate the predictions/ folder Boltz creates."""
-    for pattern in ["boltz_results_*"]:
-        dirs = sorted(
-            glob.glob(os.path.join(output_dir, pattern)),
-            key=os.path.getmtime,
-            reverse=True,
-        )
-        if dirs:
-            pred = os.path.join(dirs[0], "predictions")
-            if os.path.isdir(pred):
-                return pred
+    newest, newest_mtime = None, -1.0
+    try:
+        with os.scandir(output_dir) as it:
+            for entry in it:
+                if entry.name.startswith("boltz_results_") and entry.is_dir():
+                    mtime = entry.stat().st_mtime
+                    if mtime > newest_mtime:
+                        newest, newest_mtime = entry.path, mtime
+    except OSError:
+        pass
+    if newest:
+        pred = os.path.join(newest, "predictions")
+        if os.path.isdir(pred):
+            return pred
     direct = os.path.join(output_dir, "predictions")
     return direct if os.path.isdir(direct) else None
 
 
+def _scan_outputs(pred_dir: str) -> tuple[list[str], list[str], list[str]]:
+    """Return (cif, pdb, json) paths under *pred_dir* from a single walk."""
+    found: dict[str, list[str]] = {".cif": [], ".pdb": [], ".json": []}
+    for root, _dirs, files in os.walk(pred_dir):
+        for name in sorted(files):
+            bucket = found.get(os.path.splitext(name)[1])
+            if bucket is not None:
+                bucket.append(os.path.join(root, name))
+    return found[".cif"], found[".pdb"], found[".json"]
+
+
 def _collect_metrics(json_files: list[str]) -> dict:
     """Read Boltz JSON outputs and collect confidence metrics."""
     metrics: dict = {}
@@ -197,102 +365,196 @@ def _collect_metrics(json_files: list[str]) -> dict:
     }
     for path in json_files:
         try:
-            with open(path) as fh:
-                data = json.load(fh)
+            data = json_loads(Path(path).read_bytes())
             for src_key, dst_key in metric_keys.items():
                 if src_key in data and dst_key not in metrics:
-                    metrics[dst_key] = data[src_key]
+                    value = data[src_key]
+                    if isinstance(value, list):
+                        # per-residue/per-sample values; averaged for display
+                        value = np.asarray(value, dtype=np.float32)
+                    metrics[dst_key] = value
         except Exception as exc:
             print(f"Warning: failed to read {path}: {exc}")
     return metrics
 
 
+# Known failure signatures, matched in one pass over the Boltz output.
+_FAILURE_RE = re.compile(
+    r"(?P<oom>CUDA out of memory|OutOfMemoryError)"
+    r"|(?P<nofile>No such file or directory)"
+    r"|(?P<keyerror>KeyError(?:: ['\"]?(?P<key>[^'\"\n]+))?)"
+)
+_ERROR_LINE_RE = re.compile(r"^.*(?:Error|Exception):.*$", re.MULTILINE)
+_NOISE_RE = re.compile(r"%\||it/s|━|warnings\.warn")
+
+
 def _extract_error(output: str, seq_len: int, log_path: str) -> str:
     """Return a human-friendly error from Boltz stderr/stdout."""
-    if "CUDA out of memory" in output or "OutOfMemoryError" in output:
+    found: set[str] = set()
+    key = None
+    for m in _FAILURE_RE.finditer(output):
+        found.add(m.lastgroup)
+        if m.lastgroup == "oom":
+            break
+        key = key or m["key"]
+    if "oom" in found:
         return (
-            f"GPU out of memory. Sequence ({seq_len} aa) is too long for "
-            "this GPU. Try shorter or use a bigger GPU."
+            f"GPU out of memory. The complex ({seq_len} residues) is too "
+            "large for this GPU. Try shorter or use a bigger GPU."
         )
-    if "No such file or directory" in output:
+    if "nofile" in found:
         return "Input file error — check your sequence format."
-    if "KeyError" in output:
-        m = re.search(r"KeyError: ['\"]?([^'\"]+)['\"]?", output)
-        key = m.group(1) if m else "unknown"
+    if "keyerror" in found:
+        key = key or "unknown"
         return f"YAML parsing error: KeyError '{key}' — chain ID format may be wrong."
 
-    lines = output.split("\n")
     # Look for a Python traceback
-    tb_start = next((i for i, l in enumerate(lines) if "Traceback" in l), None)
-    if tb_start is not None:
-        tail = [l for l in lines[tb_start:] if l.strip()][-20:]
+    tb = output.find("Traceback")
+    if tb != -1:
+        tb_text = output[output.rfind("\n", 0, tb) + 1 :]
+        tail = [l for l in tb_text.split("\n") if l.strip()][-20:]
         return "Prediction failed:\n" + "\n".join(tail)
 
     # Fall back to error-ish lines
-    errs = [l for l in lines if "Error:" in l or "Exception:" in l]
+    errs = _ERROR_LINE_RE.findall(output)
     if errs:
         return "\n".join(errs[-5:])
 
     clean = [
-        l
-        for l in lines
-        if l.strip()
-        and not any(x in l for x in ["%|", "it/s", "━", "warnings.warn"])
+        l for l in output.split("\n") if l.strip() and not _NOISE_RE.search(l)
     ]
     return "\n".join(clean[-15:]) or f"Unknown error — see {log_path}"
 
 
+def _kill(proc: subprocess.Popen) -> None:
+    """Kill *proc* and any workers it spawned (it leads its own session)."""
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+    proc.wait()
+
+
+def cancel_prediction(output_dir: str) -> None:
+    """Stop the Boltz run writing to *output_dir* and delete the directory."""
+    proc = _ACTIVE_JOBS.pop(output_dir, None)
+    if proc is not None and proc.poll() is None:
+        _kill(proc)
+    _forget_job_dir(output_dir)
+
+
+def _pump_output(stream, lines: queue.Queue) -> None:
+    """Copy *stream* into *lines* one line at a time; ``None`` marks EOF."""
+    try:
+        for line in stream:
+            lines.put(line.rstrip("\n"))
+    finally:
+        lines.put(None)
+
+
 def run_prediction(
     yaml_path: str,
     output_dir: str,
     *,
     sampling_steps: int = 50,
     seq_len: int = 0,
-) -> tuple[bool, str, dict, str]:
-    """
-    Execute Boltz-2 and return (success, structure_path_or_error, metrics, raw_log).
+) -> Generator[str | None, None, tuple[bool, str, dict, str]]:
     """
-    os.environ["TORCH_FLOAT32_MATMUL_PRECISION"] = "medium"
+    Execute Boltz-2, yielding its output lines as they are produced.
 
+    ``None`` is yielded after each second without output, so the caller
+    can flush throttled UI updates while Boltz is quiet.
+
+    The generator's return value is
+    (success, structure_path_or_error, metrics, raw_log).
+    """
     cmd = _build_command(yaml_path, output_dir, sampling_steps, seq_len)
     log_path = os.path.join(output_dir, "boltz_log.txt")
     raw_log = f"Command: {' '.join(cmd)}\n\n"
 
     try:
-        result = subprocess.run(
-            cmd, capture_output=True, text=True, timeout=PREDICTION_TIMEOUT
+        proc = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            errors="replace",  # a stray non-UTF-8 byte must not kill the reader
+            bufsize=1,
+            start_new_session=True,
         )
+    except FileNotFoundError:
+        return (
+            False,
+            "Boltz-2 not found. Ensure 'boltz' is installed and on PATH.",
+            {},
+            "",
+        )
+    except Exception as exc:
+        return False, f"Error running Boltz-2: {exc}", {}, raw_log
+    _ACTIVE_JOBS[output_dir] = proc
+
+    # Read output on a background thread so a quiet Boltz process never
+    # blocks the timeout check below.
+    lines: queue.Queue = queue.Queue()
+    threading.Thread(
+        target=_pump_output, args=(proc.stdout, lines), daemon=True
+    ).start()
+
+    # Only the tail stays in memory; the full log is streamed to disk.
+    tail: deque[str] = deque(maxlen=LOG_TAIL_LINES)
+    deadline = time.monotonic() + PREDICTION_TIMEOUT
+    try:
+        with open(log_path, "w") as log_fh:
+            log_fh.write(raw_log)
+            while True:
+                if time.monotonic() > deadline:
+                    _kill(proc)
+                    raw_log += "\n".join(tail)
+                    return False, "Prediction timed out (>30 min).", {}, raw_log
+                try:
+                    line = lines.get(timeout=1.0)
+                except queue.Empty:
+                    yield None  # heartbeat
+                    continue
+                if line is None:
+                    break
+                log_fh.write(line + "\n")
+                tail.append(line)
+                yield line
+
+            try:
+                returncode = proc.wait(
+                    timeout=max(0, deadline - time.monotonic())
+                )
+            except subprocess.TimeoutExpired:
+                _kill(proc)
+                raw_log += "\n".join(tail)
+                return False, "Prediction timed out (>30 min).", {}, raw_log
+            log_fh.write(f"\nReturn code: {returncode}\n")
+        if output_dir not in _ACTIVE_JOBS:
+            return False, "Prediction cancelled.", {}, raw_log
+        output_text = "\n".join(tail)
         raw_log += (
-            f"Return code: {result.returncode}\n\n"
-            f"=== STDOUT ===\n{result.stdout or '(empty)'}\n\n"
-            f"=== STDERR ===\n{result.stderr or '(empty)'}"
+            f"Return code: {returncode}\n\n"
+            f"=== OUTPUT (last {LOG_TAIL_LINES} lines) ===\n"
+            f"{output_text or '(empty)'}"
         )
-        with open(log_path, "w") as fh:
-            fh.write(raw_log)
 
         pred_dir = _find_predictions_dir(output_dir)
-        cif = pdb = json_files = []
-        if pred_dir:
-            _g = lambda ext: glob.glob(
-                os.path.join(pred_dir, "**", ext), recursive=True
-            )
-            cif, pdb, json_files = _g("*.cif"), _g("*.pdb"), _g("*.json")
+        cif, pdb, json_files = (
+            _scan_outputs(pred_dir) if pred_dir else ([], [], [])
+        )
 
         structure = (cif or pdb or [None])[0]
         if structure:
             return True, structure, _collect_metrics(json_files), raw_log
 
-        error_text = result.stderr or result.stdout or ""
-        return False, _extract_error(error_text, seq_len, log_path), {}, raw_log
+        return False, _extract_error(output_text, seq_len, log_path), {}, raw_log
 
-    except subprocess.TimeoutExpired:
-        return False, "Prediction timed out (>30 min).", {}, raw_log
-    except FileNotFoundError:
-        return (
-            False,
-            "Boltz-2 not found. Ensure 'boltz' is installed and on PATH.",
-            {},
-            "",
-        )
     except Exception as exc:
         return False, f"Error running Boltz-2: {exc}", {}, raw_log
+    finally:
+        # Also reached when the consumer abandons the generator early.
+        _ACTIVE_JOBS.pop(output_dir, None)
+        if proc.poll() is None:
+            _kill(proc)
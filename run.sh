@@ -20,13 +20,33 @@ else
     fi
 fi
 
-# Install dependencies
-echo "Installing dependencies..."
-pip install --upgrade pip -q
-pip install -r requirements.txt -q || echo "⚠ Some dependencies failed — check errors above"
+# Install dependencies (skipped on warm starts while requirements.txt and the
+# target environment are unchanged and the core packages still import)
+DEPS_MARKER=".deps_installed"
+REQ_HASH=$( { cat requirements.txt; python -c "import sys; print(sys.prefix)"; } \
+    | sha256sum | cut -d' ' -f1)
+if [ -f "$DEPS_MARKER" ] && [ "$(cat "$DEPS_MARKER")" = "$REQ_HASH" ] \
+    && python -c "import boltz, gradio" 2>/dev/null; then
+    echo "✓ Dependencies already installed"
+else
+    echo "Installing dependencies..."
+    pip install --upgrade pip -q
+    if pip install -r requirements.txt -q; then
+        echo "$REQ_HASH" > "$DEPS_MARKER"
+    else
+        echo "⚠ Some dependencies failed — check errors above"
+    fi
 
-# Optional: CUDA kernel optimizations
-pip install cuequivariance-ops-torch-cu12 -q 2>/dev/null || true
+    # Optional: CUDA kernel optimizations
+    pip install cuequivariance-ops-torch-cu12 -q 2>/dev/null || true
+fi
+
+# 3Dmol.js for the structure viewer, served by the app itself (CDN if absent)
+if [ ! -s assets/3Dmol-min.js ]; then
+    mkdir -p assets
+    curl -fsSL https://3dmol.org/build/3Dmol-min.js -o assets/3Dmol-min.js \
+        || rm -f assets/3Dmol-min.js
+fi
 
 # GPU check
 echo ""
@@ -3,23 +3,41 @@ Visualization helpers: 3Dmol.js viewer, PAE heatmap, pLDDT line chart,
 and confidence-file discovery in Boltz output directories.
 """
 
-import base64
-import glob
+import hashlib
+import html
 import json
+import mmap
 import os
+import re
+import shutil
+import tempfile
+import threading
+from pathlib import Path
 from typing import Optional
 
 import numpy as np
 
-try:
-    import matplotlib
+from jsonload import json_loads
 
-    matplotlib.use("Agg")
-    import matplotlib.pyplot as plt
+# matplotlib is imported on the first plot (see _pyplot); importing it here
+# would add its startup cost to every `import visualization`.
+_plt = None
+
+
+def _pyplot():
+    """Return matplotlib.pyplot on the Agg backend, or None if missing."""
+    global _plt
+    if _plt is None:
+        try:
+            import matplotlib
+
+            matplotlib.use("Agg")
+            import matplotlib.pyplot as plt
+        except ImportError:
+            return None
+        _plt = plt
+    return _plt
 
-    HAS_MPL = True
-except ImportError:
-    HAS_MPL = False
 
 # ---------------------------------------------------------------------------
 # AlphaFold-style pLDDT colour thresholds
@@ -32,21 +50,40 @@ PLDDT_COLORS = {
 }
 
 
+_PLDDT_THRESHOLDS = np.array(sorted(PLDDT_COLORS))
+_PLDDT_PALETTE = np.array([PLDDT_COLORS[t] for t in sorted(PLDDT_COLORS)])
+
+
+def plddt_colors(scores: np.ndarray) -> np.ndarray:
+    """Map an array of pLDDT scores to their band colours in one call."""
+    idx = np.searchsorted(_PLDDT_THRESHOLDS, scores, side="right") - 1
+    return _PLDDT_PALETTE[np.maximum(idx, 0)]
+
+
 def _plddt_color(score: float) -> str:
-    for threshold in (90, 70, 50):
-        if score >= threshold:
-            return PLDDT_COLORS[threshold]
-    return PLDDT_COLORS[0]
+    return str(plddt_colors(np.asarray([score]))[0])
 
 
 # ---------------------------------------------------------------------------
 # 3D viewer (3Dmol.js in an iframe)
 # ---------------------------------------------------------------------------
 
+THREEDMOL_CDN = "https://3dmol.org/build/3Dmol-min.js"
+# Where viewer iframes load 3Dmol.js from. app.py points this at a locally
+# served copy when one is installed, so every viewer reuses one cached,
+# revalidatable response instead of a cross-origin CDN fetch.
+_viewer_script_src = THREEDMOL_CDN
+
+
+def set_viewer_script(src: str) -> None:
+    """Load 3Dmol.js from *src* (a URL, may be relative to the app)."""
+    global _viewer_script_src
+    _viewer_script_src = src
+
+
 _VIEWER_TEMPLATE = """<!DOCTYPE html>
 <html><head>
-<script src="https://cdnjs.cloudflare.com/ajax/libs/jquery/3.6.0/jquery.min.js"></script>
-<script src="https://3dmol.org/build/3Dmol-min.js"></script>
+<script src="{script_src}"></script>
 <style>
   body {{ margin:0; padding:0; overflow:hidden }}
   #viewer {{ width:100%; height:100%; position:absolute; top:0; left:0 }}
@@ -65,9 +102,9 @@ _VIEWER_TEMPLATE = """<!DOCTYPE html>
 <div id="cbar-labels"><span>100</span><span>90</span><span>70</span><span>50</span><span>0</span></div>
 <div id="cbar-title">pLDDT Score</div>
 <script>
-$(function(){{
+(function(){{
   var v=$3Dmol.createViewer('viewer',{{backgroundColor:'#1a1a2e'}});
-  var d="{data}";
+  var d={data};
   d=d.replace(/\\\\n/g,'\\n');
   v.addModel(d,"{fmt}");
   v.setStyle({{}},{{cartoon:{{
@@ -84,28 +121,29 @@ $(function(){{
     sphere:{{scale:0.25}}
   }});
   v.zoomTo(); v.render(); v.spin('y',0.5);
-}});
+}})();
 </script></body></html>"""
 
 
-def viewer_html(structure_text: str, fmt: str = "cif") -> str:
-    """Return an <iframe> embedding a 3Dmol.js viewer for *structure_text*."""
-    escaped = (
-        structure_text.replace("\\", "\\\\")
-        .replace("`", "\\`")
-        .replace("$", "\\$")
-        .replace("\r\n", "\\n")
-        .replace("\r", "\\n")
-        .replace("\n", "\\n")
-        .replace("'", "\\'")
-        .replace('"', '\\"')
+def viewer_html(structure_path: str, fmt: str = "cif") -> str:
+    """Return an <iframe> embedding a 3Dmol.js viewer for *structure_path*."""
+    structure_text = Path(structure_path).read_text()
+    if "\r" in structure_text:
+        structure_text = structure_text.replace("\r\n", "\n").replace(
+            "\r", "\n"
+        )
+    # json.dumps escapes a JS string literal in one C pass; "<" is escaped
+    # too so a "</script>" in the file cannot close the script block.
+    data = json.dumps(structure_text).replace("<", "\\u003c")
+    inner = _VIEWER_TEMPLATE.format(
+        script_src=html.escape(_viewer_script_src), data=data, fmt=fmt
     )
-    inner = _VIEWER_TEMPLATE.format(data=escaped, fmt=fmt)
-    b64 = base64.b64encode(inner.encode()).decode()
+    # srcdoc only needs attribute escaping, no base64 round-trip. The frame
+    # shares the page's origin, so it must not get allow-same-origin.
     return (
-        f'<iframe src="data:text/html;base64,{b64}" '
+        f'<iframe srcdoc="{html.escape(inner, quote=True)}" '
         f'style="width:100%;height:500px;border:none;border-radius:12px;'
-        f'background:#1a1a2e" sandbox="allow-scripts allow-same-origin"></iframe>'
+        f'background:#1a1a2e" sandbox="allow-scripts"></iframe>'
     )
 
 
@@ -113,105 +151,233 @@ def viewer_html(structure_text: str, fmt: str = "cif") -> str:
 # Confidence plots
 # ---------------------------------------------------------------------------
 
+# Rendered PNGs keyed by the plotted data, so repeat renders of the same
+# matrix (e.g. a result re-plotted after its cache entry was evicted) skip
+# matplotlib entirely, including its import. Lives in the app's private
+# 0700 temp directory; sweep_plot_cache() keeps it bounded.
+_PLOT_CACHE_DIR = Path(tempfile.gettempdir()) / "boltz2-app" / "plots"
+_PLOT_CACHE_MAX_FILES = 256
+# Bump whenever plot_pae/plot_plddt output changes so stale PNGs are ignored
+_PLOT_STYLE_VERSION = 1
+
+
+def _plot_cache_path(kind: str, data: np.ndarray) -> Path:
+    h = hashlib.blake2b(data.tobytes(), digest_size=16)
+    h.update(f"{_PLOT_STYLE_VERSION}{data.dtype}{data.shape}".encode())
+    return _PLOT_CACHE_DIR / f"{kind}_{h.hexdigest()}.png"
+
+
+def _cached_plot(cached: Path, out_path: str) -> Optional[str]:
+    try:
+        shutil.copyfile(cached, out_path)
+        os.utime(cached)  # mark as recently used for sweep_plot_cache
+        return out_path
+    except OSError:
+        return None
+
+
+def _store_plot(out_path: str, cached: Path) -> None:
+    try:
+        _PLOT_CACHE_DIR.parent.mkdir(mode=0o700, exist_ok=True)
+        _PLOT_CACHE_DIR.mkdir(mode=0o700, exist_ok=True)
+        tmp = cached.with_suffix(f".{os.getpid()}.tmp")
+        shutil.copyfile(out_path, tmp)
+        os.replace(tmp, cached)
+    except OSError as exc:
+        print(f"Plot cache write failed: {exc}")
+
+
+def sweep_plot_cache(max_files: int = _PLOT_CACHE_MAX_FILES) -> None:
+    """Delete the least recently used cached plots beyond *max_files*."""
+    try:
+        with os.scandir(_PLOT_CACHE_DIR) as it:
+            entries = [(e.stat().st_mtime, e.path) for e in it if e.is_file()]
+    except FileNotFoundError:
+        return
+    entries.sort(reverse=True)
+    for _, path in entries[max_files:]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+# One Figure per plot type, reused across calls: building a Figure, its
+# Axes and the PAE colorbar costs more than drawing into them. Agg is not
+# reentrant, so all rendering goes through _PLOT_LOCK.
+_PLOT_LOCK = threading.Lock()
+_FIGURES: dict[str, tuple] = {}
+_PAE_COLORBAR = None
+
+
+def _pooled_axes(kind: str, figsize: tuple[float, float]) -> tuple:
+    """Return the reusable ``(fig, ax)`` for *kind*, cleared for a new plot."""
+    if kind in _FIGURES:
+        fig, ax, params = _FIGURES[kind]
+        ax.clear()
+        # Undo the previous tight_layout so it is not applied on top of itself
+        fig.subplots_adjust(**params)
+    else:
+        fig, ax = _plt.subplots(figsize=figsize)
+        sp = fig.subplotpars
+        params = {k: getattr(sp, k) for k in ("left", "right", "bottom", "top")}
+        _FIGURES[kind] = fig, ax, params
+    return fig, ax
+
+
+# Dark theme for the PAE heatmap, applied once instead of per artist
+_PAE_DARK_RC = {
+    "figure.facecolor": "#1a1a2e",
+    "axes.facecolor": "#1a1a2e",
+    "savefig.facecolor": "#1a1a2e",
+    "savefig.dpi": 150,
+    "axes.edgecolor": "white",
+    "axes.labelcolor": "white",
+    "xtick.color": "white",
+    "ytick.color": "white",
+    "text.color": "white",
+}
+
+
+# Roughly the heatmap's pixel width at figsize=(8, 7) and 150 dpi; larger
+# matrices are averaged down before imshow instead of resampled per render.
+_PAE_MAX_PIXELS = 1200
+
+
+def _downsample_pae(matrix: np.ndarray) -> tuple[np.ndarray, int]:
+    """Block-average *matrix* to at most ~_PAE_MAX_PIXELS per side.
+
+    Returns the array to draw and the number of residues it spans (a few
+    trailing residues are dropped when n is not a multiple of the stride).
+    """
+    n = matrix.shape[0]
+    if n <= _PAE_MAX_PIXELS or matrix.ndim != 2:
+        return matrix, n
+    stride = -(-n // _PAE_MAX_PIXELS)
+    m = n // stride
+    blocks = matrix[: m * stride, : m * stride].reshape(m, stride, m, stride)
+    return blocks.mean(axis=(1, 3), dtype=np.float32), m * stride
+
 
 def plot_pae(matrix: np.ndarray, out_path: str) -> Optional[str]:
     """Create and save a PAE heatmap. Returns *out_path* on success."""
-    if not HAS_MPL:
+    cached = _plot_cache_path("pae", matrix)
+    if cached.exists() and _cached_plot(cached, out_path):
+        return out_path
+    plt = _pyplot()
+    if plt is None:
         return None
+    global _PAE_COLORBAR
     try:
-        fig, ax = plt.subplots(figsize=(8, 7))
-        im = ax.imshow(matrix, cmap="Greens_r", vmin=0, vmax=30, aspect="equal")
-
-        cbar = plt.colorbar(im, ax=ax, shrink=0.8, pad=0.02)
-        cbar.set_label("Expected Position Error (Å)", fontsize=11)
-
-        n = matrix.shape[0]
-        step = 150 if n > 500 else (50 if n > 200 else 25)
-        ticks = np.arange(0, n, step)
-        ax.set_xticks(ticks)
-        ax.set_xticklabels(ticks + 1)
-        ax.set_yticks(ticks)
-        ax.set_yticklabels(ticks + 1)
-        ax.set_xlabel("Scored Residue", fontsize=12)
-        ax.set_ylabel("Aligned Residue", fontsize=12)
-
-        # Dark theme
-        for obj in (ax, fig):
-            (
-                obj.set_facecolor("#1a1a2e")
-                if hasattr(obj, "set_facecolor")
-                else None
+        with _PLOT_LOCK, plt.rc_context(_PAE_DARK_RC):
+            fig, ax = _pooled_axes("pae", (8, 7))
+            shown, n = _downsample_pae(matrix)
+            # extent keeps the axes in residue coordinates after downsampling
+            im = ax.imshow(
+                shown,
+                cmap="Greens_r",
+                vmin=0,
+                vmax=30,
+                aspect="equal",
+                extent=(-0.5, n - 0.5, n - 0.5, -0.5),
             )
-            getattr(obj.patch, "set_facecolor", lambda _: None)("#1a1a2e")
-        ax.tick_params(colors="white")
-        for lbl in (ax.xaxis.label, ax.yaxis.label):
-            lbl.set_color("white")
-        cbar.ax.yaxis.set_tick_params(color="white")
-        cbar.outline.set_edgecolor("white")
-        cbar.ax.yaxis.label.set_color("white")
-        plt.setp(plt.getp(cbar.ax.axes, "yticklabels"), color="white")
-        for sp in ax.spines.values():
-            sp.set_edgecolor("white")
-
-        fig.set_facecolor("#1a1a2e")
-        ax.set_facecolor("#1a1a2e")
-        plt.tight_layout()
-        plt.savefig(
-            out_path,
-            dpi=150,
-            facecolor="#1a1a2e",
-            bbox_inches="tight",
-            pad_inches=0.1,
-        )
-        plt.close(fig)
+
+            if _PAE_COLORBAR is None:
+                _PAE_COLORBAR = fig.colorbar(im, ax=ax, shrink=0.8, pad=0.02)
+                _PAE_COLORBAR.set_label(
+                    "Expected Position Error (Å)", fontsize=11
+                )
+            else:
+                _PAE_COLORBAR.update_normal(im)
+
+            step = 150 if n > 500 else (50 if n > 200 else 25)
+            ticks = np.arange(0, n, step)
+            ax.set_xticks(ticks)
+            ax.set_xticklabels(ticks + 1)
+            ax.set_yticks(ticks)
+            ax.set_yticklabels(ticks + 1)
+            ax.set_xlabel("Scored Residue", fontsize=12)
+            ax.set_ylabel("Aligned Residue", fontsize=12)
+
+            fig.tight_layout()
+            fig.savefig(out_path, bbox_inches="tight", pad_inches=0.1)
+        _store_plot(out_path, cached)
         return out_path
     except Exception as exc:
         print(f"PAE plot error: {exc}")
         return None
 
 
+# pLDDT confidence bands: (low, high, colour, legend label)
+_BANDS = [
+    (90, 100, "#0053d6", "Very high (>90)"),
+    (70, 90, "#65cbf3", "Confident (70-90)"),
+    (50, 70, "#ffdb13", "Low (50-70)"),
+    (0, 50, "#ff7d45", "Very low (<50)"),
+]
+
+
 def plot_plddt(scores: np.ndarray, out_path: str) -> Optional[str]:
     """Create and save a per-residue pLDDT chart. Returns *out_path*."""
-    if not HAS_MPL:
+    cached = _plot_cache_path("plddt", scores)
+    if cached.exists() and _cached_plot(cached, out_path):
+        return out_path
+    if _pyplot() is None:
         return None
+    from matplotlib.collections import PolyCollection
+    from matplotlib.patches import Patch
+
     try:
-        fig, ax = plt.subplots(figsize=(10, 4))
-        x = np.arange(1, len(scores) + 1)
-
-        ax.fill_between(x, scores, alpha=0.3, color="#65cbf3")
-        ax.plot(x, scores, color="#0053d6", linewidth=1.5)
-
-        # Confidence bands
-        bands = [
-            (90, 100, "#0053d6", "Very high (>90)"),
-            (70, 90, "#65cbf3", "Confident (70-90)"),
-            (50, 70, "#ffdb13", "Low (50-70)"),
-            (0, 50, "#ff7d45", "Very low (<50)"),
-        ]
-        for lo, hi, c, lbl in bands:
-            ax.axhspan(lo, hi, alpha=0.1, color=c, label=lbl)
-
-        ax.set(
-            xlabel="Residue Position",
-            ylabel="pLDDT Score",
-            xlim=(1, len(scores)),
-            ylim=(0, 100),
-        )
-        ax.legend(loc="lower right", fontsize=9, framealpha=0.9)
-        ax.grid(True, alpha=0.3, linestyle="--")
-        ax.set_axisbelow(True)
-        ax.set_facecolor("white")
-        fig.patch.set_facecolor("white")
-
-        plt.tight_layout()
-        plt.savefig(
-            out_path,
-            dpi=150,
-            facecolor="white",
-            bbox_inches="tight",
-            pad_inches=0.1,
-        )
-        plt.close(fig)
+        with _PLOT_LOCK:
+            fig, ax = _pooled_axes("plddt", (10, 4))
+            x = np.arange(1, len(scores) + 1)
+
+            ax.fill_between(x, scores, alpha=0.3, color="#65cbf3")
+            ax.plot(x, scores, color="#0053d6", linewidth=1.5)
+
+            # Confidence bands: one collection spanning the full axes width
+            # (x in axes coords, like axhspan), legend entries via proxies
+            bands = PolyCollection(
+                [
+                    [(0, lo), (1, lo), (1, hi), (0, hi)]
+                    for lo, hi, _, _ in _BANDS
+                ],
+                facecolors=[c for *_, c, _ in _BANDS],
+                edgecolors=[c for *_, c, _ in _BANDS],
+                alpha=0.1,
+                transform=ax.get_yaxis_transform(),
+            )
+            ax.add_collection(bands, autolim=False)
+
+            ax.set(
+                xlabel="Residue Position",
+                ylabel="pLDDT Score",
+                xlim=(1, len(scores)),
+                ylim=(0, 100),
+            )
+            ax.legend(
+                handles=[
+                    Patch(color=c, alpha=0.1, label=lbl)
+                    for *_, c, lbl in _BANDS
+                ],
+                loc="lower right",
+                fontsize=9,
+                framealpha=0.9,
+            )
+            ax.grid(True, alpha=0.3, linestyle="--")
+            ax.set_axisbelow(True)
+            ax.set_facecolor("white")
+            fig.patch.set_facecolor("white")
+
+            fig.tight_layout()
+            fig.savefig(
+                out_path,
+                dpi=150,
+                facecolor="white",
+                bbox_inches="tight",
+                pad_inches=0.1,
+            )
+        _store_plot(out_path, cached)
         return out_path
     except Exception as exc:
         print(f"pLDDT plot error: {exc}")
@@ -223,37 +389,52 @@ def plot_plddt(scores: np.ndarray, out_path: str) -> Optional[str]:
 # ---------------------------------------------------------------------------
 
 
-def find_confidence_files(base_dir: str) -> dict:
-    """Search *base_dir* (and parents) for PAE/pLDDT npz and confidence JSON."""
-    result = {"pae": None, "plddt": None, "confidence_json": None}
-    dirs = [base_dir]
-    for _ in range(2):
-        p = os.path.dirname(dirs[-1])
-        if p:
-            dirs.append(p)
-
-    for d in dirs:
-        # Search for ALL npz files (not just pae/plddt named ones)
-        for f in glob.glob(os.path.join(d, "**", "*.npz"), recursive=True):
-            name = os.path.basename(f).lower()
-            print(f"  [confidence] Found npz: {f}")
-            if "pae" in name and not result["pae"]:
-                result["pae"] = f
-            elif "plddt" in name and not result["plddt"]:
-                result["plddt"] = f
-        for f in glob.glob(
-            os.path.join(d, "**", "confidence*.json"), recursive=True
-        ):
-            print(f"  [confidence] Found JSON: {f}")
-            if not result["confidence_json"]:
-                result["confidence_json"] = f
-        # Also look for any JSON in predictions that might contain PAE
-        if not result["confidence_json"]:
-            for f in glob.glob(os.path.join(d, "**", "*.json"), recursive=True):
-                if not result["confidence_json"]:
-                    print(f"  [confidence] Found alt JSON: {f}")
-                    result["confidence_json"] = f
+def find_confidence_files(roots: str | list[str]) -> dict:
+    """Search *roots* (in priority order) for PAE/pLDDT npz and confidence JSON.
 
+    Overlapping roots are walked once: directories already visited under an
+    earlier root are skipped, and the walk stops as soon as all three files
+    have been found.
+    """
+    if isinstance(roots, str):
+        roots = [roots]
+    roots = list(dict.fromkeys(roots))
+    result = {"pae": None, "plddt": None, "confidence_json": None}
+    alt_json = None
+    seen: set[str] = set()
+
+    for root in roots:
+        for d, subdirs, files in os.walk(root):
+            real = os.path.realpath(d)
+            if real in seen:
+                subdirs[:] = []
+                continue
+            seen.add(real)
+            for fname in sorted(files):
+                f = os.path.join(d, fname)
+                name = fname.lower()
+                if name.endswith(".npz"):
+                    print(f"  [confidence] Found npz: {f}")
+                    if "pae" in name and not result["pae"]:
+                        result["pae"] = f
+                    elif "plddt" in name and not result["plddt"]:
+                        result["plddt"] = f
+                elif name.endswith(".json"):
+                    if fname.startswith("confidence"):
+                        print(f"  [confidence] Found JSON: {f}")
+                        result["confidence_json"] = (
+                            result["confidence_json"] or f
+                        )
+                    elif not alt_json:
+                        # Any JSON in predictions might still contain PAE
+                        print(f"  [confidence] Found alt JSON: {f}")
+                        alt_json = f
+            if all(result.values()):
+                break
+        if all(result.values()):
+            break
+
+    result["confidence_json"] = result["confidence_json"] or alt_json
     print(
         f"  [confidence] Result: pae={result['pae']}, plddt={result['plddt']}, json={result['confidence_json']}"
     )
@@ -275,58 +456,135 @@ def _squeeze_array(arr: np.ndarray) -> np.ndarray:
             if arr.shape[-1] < arr.shape[0]
             else arr.mean(axis=0)
         )
-    arr = arr.flatten()
-    if arr.max() <= 1.0:
-        arr = arr * 100
+    return _to_percent(arr.flatten())  # flatten() copies, so it's writable
+
+
+def _to_percent(arr: np.ndarray) -> np.ndarray:
+    """Scale 0-1 scores to 0-100 in place.
+
+    Only the first 64 values are inspected: a 0-100 pLDDT track never has a
+    long run of scores at or below 1.
+    """
+    if arr.size and arr[:64].max() <= 1.0:
+        arr *= 100
     return arr
 
 
 def _load_npz(path: str, keys: list[str]) -> Optional[np.ndarray]:
+    """Decode only the first matching member (a .npy file is memory-mapped)."""
     try:
-        data = np.load(path)
-        for k in keys:
-            if k in data.files:
-                return _squeeze_array(data[k])
-        return _squeeze_array(data[data.files[0]])
+        data = np.load(path, mmap_mode="r", allow_pickle=False)
+        if isinstance(data, np.ndarray):
+            return _squeeze_array(data)
+        with data:
+            key = next((k for k in keys if k in data.files), data.files[0])
+            return _squeeze_array(data[key])
     except Exception:
         return None
 
 
+_ATOM_SITE_HEADER_RE = re.compile(
+    rb"^loop_[ \t]*\r?\n((?:_atom_site\.\S+[ \t]*\r?\n)+)", re.MULTILINE
+)
+_CIF_BLOCK_ENDS = (b"\n#", b"\nloop_", b"\n_", b"\ndata_")
+
+
+def _first_bfactors_by_row(
+    block: bytes, ncols: int, res_idx: int, b_idx: int
+) -> dict[int, float]:
+    """Slow path: split every row of the atom_site loop in Python."""
+    by_residue: dict[int, float] = {}
+    for line in block.splitlines():
+        parts = line.split()
+        if len(parts) == ncols and parts[res_idx].isdigit():
+            by_residue.setdefault(int(parts[res_idx]), float(parts[b_idx]))
+    return by_residue
+
+
+def _first_bfactors_vectorized(
+    block: bytes, ncols: int, res_idx: int, b_idx: int
+) -> dict[int, float]:
+    """Map residue id → B-factor of its first atom, tokenizing in NumPy.
+
+    Token boundaries are found over the raw bytes, and Python strings are
+    only built for the rows where the residue id changes (one per residue
+    rather than one per atom column). Raises ValueError when rows cannot
+    be split into exactly *ncols* whitespace-separated tokens.
+    """
+    if b'"' in block or b"'" in block:
+        raise ValueError("quoted atom_site values")
+    data = np.frombuffer(block, dtype=np.uint8)
+    # Pad with whitespace on both sides so every token has a start and end
+    space = np.empty(len(data) + 2, dtype=bool)
+    space[0] = space[-1] = True
+    np.less_equal(data, 32, out=space[1:-1])
+    bounds = np.flatnonzero(space[:-1] != space[1:])
+    starts, ends = bounds[0::2], bounds[1::2]
+    if not len(starts) or len(starts) % ncols:
+        raise ValueError("atom_site rows are not uniformly tokenized")
+    starts = starts.reshape(-1, ncols)
+    ends = ends.reshape(-1, ncols)
+    res_start, res_end = starts[:, res_idx], ends[:, res_idx]
+
+    # Compare each row's residue token with the previous row's through a
+    # fixed-width byte window (ids are far shorter than 8 digits).
+    window = res_start[:, None] + np.arange(8)
+    tok = np.where(
+        window < res_end[:, None], data[np.minimum(window, len(data) - 1)], 0
+    )
+    changed = np.ones(len(tok), dtype=bool)
+    changed[1:] = (tok[1:] != tok[:-1]).any(axis=1)
+
+    by_residue: dict[int, float] = {}
+    for i in np.flatnonzero(changed):
+        rid = block[res_start[i] : res_end[i]]
+        if rid.isdigit():  # ligands/waters use "." here
+            bf = block[starts[i, b_idx] : ends[i, b_idx]]
+            by_residue.setdefault(int(rid), float(bf))
+    return by_residue
+
+
 def extract_plddt_from_cif(cif_path: str) -> Optional[np.ndarray]:
     """Read per-residue B-factors (= pLDDT) from a CIF file."""
     try:
-        by_residue: dict[int, float] = {}
-        with open(cif_path) as fh:
-            in_atom = False
-            headers: list[str] = []
-            b_idx = res_idx = -1
-            for line in fh:
-                line = line.strip()
-                if line.startswith("_atom_site."):
-                    in_atom = True
-                    h = line.split(".")[1]
-                    headers.append(h)
-                    if "B_iso" in h or "b_factor" in h.lower():
-                        b_idx = len(headers) - 1
-                    if "label_seq_id" in h:
-                        res_idx = len(headers) - 1
-                    continue
-                if in_atom and line and not line.startswith(("_", "#")):
-                    if line.startswith("loop_"):
-                        in_atom = False
-                        continue
-                    parts = line.split()
-                    if (
-                        len(parts) > max(b_idx, res_idx)
-                        and b_idx >= 0
-                        and res_idx >= 0
-                    ):
-                        try:
-                            rid = int(parts[res_idx])
-                            if rid not in by_residue:
-                                by_residue[rid] = float(parts[b_idx])
-                        except (ValueError, IndexError):
-                            pass
+        # Map the file and stop at the end of the atom_site loop: bond,
+        # entity and chem_comp tables after it are never read or decoded.
+        with open(cif_path, "rb") as fh, mmap.mmap(
+            fh.fileno(), 0, access=mmap.ACCESS_READ
+        ) as mm:
+            m = _ATOM_SITE_HEADER_RE.search(mm)
+            if not m:
+                return None
+            headers = [
+                h.split(b".", 1)[1].decode() for h in m.group(1).split()
+            ]
+            b_idx = next(
+                (
+                    i
+                    for i, h in enumerate(headers)
+                    if "B_iso" in h or "b_factor" in h.lower()
+                ),
+                -1,
+            )
+            res_idx = next(
+                (i for i, h in enumerate(headers) if "label_seq_id" in h), -1
+            )
+            if b_idx < 0 or res_idx < 0:
+                return None
+            ncols = len(headers)
+
+            start = m.end() - 1  # keep the newline ending the header
+            end = len(mm)
+            for marker in _CIF_BLOCK_ENDS:  # bounded by the earliest end
+                pos = mm.find(marker, start, end)
+                if pos >= 0:
+                    end = pos
+            block = mm[start:end]
+
+        try:
+            by_residue = _first_bfactors_vectorized(block, ncols, res_idx, b_idx)
+        except ValueError:  # quoted values may contain spaces
+            by_residue = _first_bfactors_by_row(block, ncols, res_idx, b_idx)
         if by_residue:
             return np.array([by_residue[r] for r in sorted(by_residue)])
         return None
@@ -340,11 +598,7 @@ def load_plddt(
     json_path: str | None = None,
     cif_path: str | None = None,
 ) -> Optional[np.ndarray]:
-    """Try CIF → npz → JSON to get pLDDT scores."""
-    if cif_path and os.path.exists(cif_path):
-        arr = extract_plddt_from_cif(cif_path)
-        if arr is not None and len(arr):
-            return arr
+    """Try npz → JSON → CIF to get pLDDT scores (cheapest source first)."""
     if npz_path and os.path.exists(npz_path):
         arr = _load_npz(
             npz_path, ["plddt", "predicted_lddt", "confidence", "data"]
@@ -353,14 +607,16 @@ def load_plddt(
             return arr
     if json_path and os.path.exists(json_path):
         try:
-            with open(json_path) as fh:
-                data = json.load(fh)
+            data = json_loads(Path(json_path).read_bytes())
             for k in ("plddt", "atom_plddt", "confidence", "predicted_lddt"):
                 if k in data:
-                    arr = np.array(data[k])
-                    return arr * 100 if arr.max() <= 1.0 else arr
+                    return _to_percent(np.asarray(data[k], dtype=np.float32))
         except Exception:
             pass
+    if cif_path and os.path.exists(cif_path):
+        arr = extract_plddt_from_cif(cif_path)
+        if arr is not None and len(arr):
+            return arr
     return None
 
 
@@ -371,36 +627,35 @@ def load_pae(
     # Try npz file first
     if npz_path and os.path.exists(npz_path):
         try:
-            data = np.load(npz_path)
-            print(f"  [PAE] npz keys: {data.files}")
-            keys = ["pae", "predicted_aligned_error", "data"]
-            for k in keys:
-                if k in data.files:
-                    arr = data[k]
-                    if arr.ndim == 3:
-                        arr = arr[0]
-                    if arr.ndim == 2:
-                        print(
-                            f"  [PAE] Loaded from npz key '{k}': shape={arr.shape}"
-                        )
-                        return arr
-            # Fallback to first array
-            arr = data[data.files[0]]
-            print(
-                f"  [PAE] Trying first array '{data.files[0]}': shape={arr.shape}"
-            )
-            if arr.ndim == 3:
-                arr = arr[0]
-            if arr.ndim == 2:
-                return arr
+            with np.load(npz_path, allow_pickle=False) as data:
+                print(f"  [PAE] npz keys: {data.files}")
+                keys = ["pae", "predicted_aligned_error", "data"]
+                for k in keys:
+                    if k in data.files:
+                        arr = data[k]
+                        if arr.ndim == 3:
+                            arr = arr[0]
+                        if arr.ndim == 2:
+                            print(
+                                f"  [PAE] Loaded from npz key '{k}': shape={arr.shape}"
+                            )
+                            return arr
+                # Fallback to first array
+                arr = data[data.files[0]]
+                print(
+                    f"  [PAE] Trying first array '{data.files[0]}': shape={arr.shape}"
+                )
+                if arr.ndim == 3:
+                    arr = arr[0]
+                if arr.ndim == 2:
+                    return arr
         except Exception as exc:
             print(f"  [PAE] npz load error: {exc}")
 
     # Fallback: try to extract PAE from confidence JSON
     if json_path and os.path.exists(json_path):
         try:
-            with open(json_path) as fh:
-                data = json.load(fh)
+            data = json_loads(Path(json_path).read_bytes())
             print(f"  [PAE] JSON keys: {list(data.keys())}")
             for k in ("pae", "predicted_aligned_error", "pae_matrix"):
                 if k in data: